@@ -1,13 +1,14 @@
 #!/usr/bin/env python3
 import os
-import time
 import math
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Optional, List, Tuple
+from typing import Optional, List, Tuple, Dict
 
 import rclpy
 from rclpy.node import Node
-from rclpy.time import Time
+from rclpy.qos import QoSProfile, ReliabilityPolicy, HistoryPolicy
 
 from geometry_msgs.msg import PoseStamped, PoseWithCovarianceStamped
 from sensor_msgs.msg import Image
@@ -16,9 +17,25 @@ from nav2_simple_commander.robot_navigator import BasicNavigator, TaskResult
 
 from cv_bridge import CvBridge
 import cv2
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
 import yaml
 
+try:
+    from yaml import CSafeLoader as SafeLoader  # libyaml bindings
+except ImportError:
+    from yaml import SafeLoader
+
+try:
+    import orjson
+    json_dumps = orjson.dumps
+except ImportError:
+    import json
+
+    def json_dumps(data) -> bytes:
+        return json.dumps(data).encode("utf-8")
+
 # ================== CONFIG ==================
 POSES_FILE = "/home/ubuntu/waypoints.yaml"# Path to waypoints YAML file
 
@@ -32,8 +49,14 @@ IMAGES_PER_WAYPOINT = 3
 MAX_WAYPOINT_RETRIES = 3
 
 POLL_INTERVAL_SEC = 1.0
+POLL_TIMEOUT_SEC = 0.3      # control/mission polls gate the nav loop, keep them short
+STATUS_TIMEOUT_SEC = 1.5
 CAMERA_TIMEOUT_SEC = 5.0
 
+# Uploaded JPEGs are downscaled to this width (aspect kept); local saves stay full-res
+UPLOAD_IMAGE_WIDTH = 640
+UPLOAD_JPEG_QUALITY = 70
+
 # Save images locally?
 SAVE_LOCAL_IMAGES = False
 OUTPUT_DIR = "/home/ubuntu/waypoint_photos"
@@ -55,7 +78,19 @@ DEBUG_PRINT_AMCL_AND_DELTA = True
 
 # ================== GLOBALS ==================
 bridge = CvBridge()
-last_image_msg: Optional[Image] = None
+# newest frame only: a deeper queue just buffers stale multi-MB images
+camera_qos = QoSProfile(depth=1, reliability=ReliabilityPolicy.BEST_EFFORT, history=HistoryPolicy.KEEP_LAST)
+_waypoints_cache: Dict[str, Tuple[int, Tuple[str, "XYQ", List["XYQ"]]]] = {}  # path -> (mtime_ns, parsed)
+
+# one keep-alive session for all server calls (avoids a new TCP connection per poll)
+http_session = requests.Session()
+http_session.mount("http://", HTTPAdapter(pool_connections=2, pool_maxsize=4, max_retries=0))
+
+# status updates are posted off the ROS thread; one worker keeps them in order
+status_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="status")
+
+# ETag of the last /poll answer; the server replies 304 (no body) while nothing changed
+poll_etag: Optional[str] = None
 
 
 # ================== DATA ==================
@@ -70,16 +105,15 @@ class XYQ:
 
 
 # ================== UTILS ==================
+TWO_PI = 2.0 * math.pi
+RAD_TO_DEG = 180.0 / math.pi
+
 def quat_to_yaw(qz: float, qw: float) -> float:
     return 2.0 * math.atan2(qz, qw)
 
 def yaw_diff(a: float, b: float) -> float:
-    d = a - b
-    while d > math.pi:
-        d -= 2.0 * math.pi
-    while d < -math.pi:
-        d += 2.0 * math.pi
-    return abs(d)
+    # remainder() wraps into [-pi, pi] in constant time
+    return abs(math.remainder(a - b, TWO_PI))
 
 def dist(ax: float, ay: float, bx: float, by: float) -> float:
     return math.hypot(ax - bx, ay - by)
@@ -96,6 +130,15 @@ def make_pose(frame_id: str, x: float, y: float, qz: float, qw: float) -> PoseSt
     p.pose.orientation.w = float(qw)
     return p
 
+# a reasonable /initialpose covariance (not perfect, but OK), built once
+# 6x6 row-major over [x, y, z, roll, pitch, yaw]
+_cov = [0.0] * 36
+_cov[0] = 0.25     # x
+_cov[7] = 0.25     # y
+_cov[35] = 0.30    # yaw
+INITIALPOSE_COVARIANCE = tuple(_cov)
+del _cov
+
 def make_initialpose_msg(frame_id: str, x: float, y: float, qz: float, qw: float) -> PoseWithCovarianceStamped:
     msg = PoseWithCovarianceStamped()
     msg.header.frame_id = frame_id
@@ -107,22 +150,28 @@ def make_initialpose_msg(frame_id: str, x: float, y: float, qz: float, qw: float
     msg.pose.pose.orientation.z = float(qz)
     msg.pose.pose.orientation.w = float(qw)
 
-    # a reasonable covariance (not perfect, but OK)
-    # [x, y, z, roll, pitch, yaw]
-    cov = [0.0] * 36
-    cov[0] = 0.25     # x
-    cov[7] = 0.25     # y
-    cov[35] = 0.30    # yaw
-    msg.pose.covariance = cov
+    msg.pose.covariance = INITIALPOSE_COVARIANCE
     return msg
 
 
 def load_waypoints_yaml(path: str) -> Tuple[str, XYQ, List[XYQ]]:
+    """Parse the waypoints file, reusing the last result while its mtime is unchanged."""
     if not os.path.isfile(path):
         raise FileNotFoundError(f"waypoints file not found: {path}")
 
+    mtime_ns = os.stat(path).st_mtime_ns
+    cached = _waypoints_cache.get(path)
+    if cached is not None and cached[0] == mtime_ns:
+        return cached[1]
+
+    parsed = _parse_waypoints_yaml(path)
+    _waypoints_cache[path] = (mtime_ns, parsed)
+    return parsed
+
+
+def _parse_waypoints_yaml(path: str) -> Tuple[str, XYQ, List[XYQ]]:
     with open(path, "r", encoding="utf-8") as f:
-        doc = yaml.safe_load(f)
+        doc = yaml.load(f, Loader=SafeLoader)
 
     if not isinstance(doc, dict):
         raise ValueError("waypoints.yaml must be a mapping")
@@ -163,42 +212,37 @@ def load_waypoints_yaml(path: str) -> Tuple[str, XYQ, List[XYQ]]:
 
 
 # ================== ROS CALLBACKS ==================
-def image_callback(msg: Image):
-    global last_image_msg
-    last_image_msg = msg
-
-
 class AmclMonitor:
     def __init__(self):
         self.last: Optional[XYQ] = None
         self.window_start: Optional[XYQ] = None
-        self.window_start_time: Optional[Time] = None
+        self.window_start_ns: Optional[int] = None
 
-    def update(self, msg: PoseWithCovarianceStamped, now: Time):
+    def update(self, msg: PoseWithCovarianceStamped, now_ns: int):
         p = msg.pose.pose.position
         q = msg.pose.pose.orientation
         cur = XYQ(float(p.x), float(p.y), float(q.z), float(q.w), msg.header.frame_id, "amcl")
         self.last = cur
         if self.window_start is None:
             self.window_start = cur
-            self.window_start_time = now
+            self.window_start_ns = now_ns
 
     def reset_window(self):
         self.window_start = None
-        self.window_start_time = None
+        self.window_start_ns = None
 
-    def is_stable(self, now: Time) -> Tuple[bool, str]:
-        if self.last is None or self.window_start is None or self.window_start_time is None:
+    def is_stable(self, now_ns: int) -> Tuple[bool, str]:
+        if self.last is None or self.window_start is None or self.window_start_ns is None:
             return False, "no_amcl_pose_yet"
 
-        elapsed = (now - self.window_start_time).nanoseconds / 1e9
+        elapsed = (now_ns - self.window_start_ns) * 1e-9
         if elapsed < AMCL_STABLE_WINDOW_SEC:
             return False, f"warming_up {elapsed:.1f}/{AMCL_STABLE_WINDOW_SEC:.1f}s"
 
         d = dist(self.last.x, self.last.y, self.window_start.x, self.window_start.y)
         dyaw = yaw_diff(quat_to_yaw(self.last.qz, self.last.qw),
                         quat_to_yaw(self.window_start.qz, self.window_start.qw))
-        dyaw_deg = dyaw * 180.0 / math.pi
+        dyaw_deg = dyaw * RAD_TO_DEG
 
         if d <= AMCL_MAX_POS_JUMP_M and dyaw_deg <= AMCL_MAX_YAW_JUMP_DEG:
             return True, f"stable d={d:.3f}m dyaw={dyaw_deg:.1f}deg"
@@ -207,41 +251,76 @@ class AmclMonitor:
 
 
 # ================== HTTP HELPERS ==================
+def _post_status(node: Node, data: dict):
+    try:
+        http_session.post(f"{SERVER_BASE}/status_update", data=json_dumps(data),
+                          headers={"Content-Type": "application/json"}, timeout=STATUS_TIMEOUT_SEC)
+    except Exception as e:
+        node.get_logger().warn(f"[HTTP] status '{data['status']}' failed: {e}")
+
+
 def send_status(node: Node, status: str, extra: Optional[dict] = None):
+    """Fire-and-forget: queues the POST on the status worker and returns immediately."""
     data = {"status": status}
     if extra:
         data.update(extra)
-    try:
-        requests.post(f"{SERVER_BASE}/status_update", json=data, timeout=1.5)
-    except Exception as e:
-        node.get_logger().warn(f"[HTTP] status '{status}' failed: {e}")
+    status_executor.submit(_post_status, node, data)
 
 
-def check_control_command(node: Node) -> str:
+def poll_server(node: Node) -> Tuple[str, str]:
+    """
+    One round-trip for both one-shot server flags.
+    Returns: (command, mission_state) -> ('none'|'abort'|'go_home', 'idle'|'start')
+    """
+    global poll_etag
+    headers = {"If-None-Match": poll_etag} if poll_etag else None
     try:
-        resp = requests.get(f"{SERVER_BASE}/control_state", timeout=1.5)
+        resp = http_session.get(f"{SERVER_BASE}/poll", headers=headers, timeout=POLL_TIMEOUT_SEC)
+        if resp.status_code == 304:
+            return "none", "idle"
         if resp.status_code != 200:
-            return "none"
-        cmd = (resp.json() or {}).get("command", "none")
-        return cmd if cmd in ("none", "abort", "go_home") else "none"
+            return "none", "idle"
+        poll_etag = resp.headers.get("ETag")
+        js = resp.json() or {}
+        cmd = js.get("command", "none")
+        if cmd not in ("none", "abort", "go_home"):
+            cmd = "none"
+        return cmd, js.get("mission_state", "idle")
     except Exception as e:
-        node.get_logger().warn(f"[HTTP] poll /control_state failed: {e}")
-        return "none"
+        node.get_logger().warn(f"[HTTP] poll /poll failed: {e}")
+        return "none", "idle"
 
 
-def poll_mission_state(node: Node) -> str:
-    """Returns: 'idle' or 'start' (server is one-shot, but we treat it as state)"""
-    url = f"{SERVER_BASE}/mission_state"
-    try:
-        resp = requests.get(url, timeout=1.5)
-        if resp.status_code != 200:
-            return "idle"
-        return (resp.json() or {}).get("mission_state", "idle")
-    except Exception:
-        return "idle"
+class ControlPoller:
+    """
+    Polls the server from a ROS timer, so loops only need to spin on ROS events.
+    Commands/start requests are latched until taken by the loop that handles them.
+    """
+    def __init__(self, node: Node):
+        self.node = node
+        self.command = "none"
+        self.start_requested = False
+        self.timer = node.create_timer(POLL_INTERVAL_SEC, self._on_timer)
+
+    def _on_timer(self):
+        cmd, state = poll_server(self.node)
+        if cmd != "none":
+            self.command = cmd
+        if state == "start":
+            self.start_requested = True
+
+    def take_command(self) -> str:
+        cmd = self.command
+        self.command = "none"
+        return cmd
+
+    def take_start(self) -> bool:
+        start = self.start_requested
+        self.start_requested = False
+        return start
 
 
-def idle_loop_wait_for_start_or_go_home(node: Node) -> str:
+def idle_loop_wait_for_start_or_go_home(node: Node, control: ControlPoller) -> str:
     """
     Blocking idle loop that allows:
       - Start mission
@@ -250,18 +329,20 @@ def idle_loop_wait_for_start_or_go_home(node: Node) -> str:
       'start' or 'go_home'
     """
     node.get_logger().info("[IDLE] Waiting for START or GO_HOME...")
+    # a Start latched during the previous mission/return home is stale: only one
+    # clicked while idle may start the next mission
+    control.take_start()
     send_status(node, "mission_idle")
 
     while rclpy.ok():
-        cmd = check_control_command(node)
+        cmd = control.take_command()
         if cmd == "go_home":
             node.get_logger().info("[IDLE] go_home requested.")
             send_status(node, "return_home_requested", {"phase": "idle"})
             return "go_home"
 
         # Abort while idle: ignore
-        state = poll_mission_state(node)
-        if state == "start":
+        if control.take_start():
             node.get_logger().info("[IDLE] start received.")
             send_status(node, "mission_started")
             return "start"
@@ -274,12 +355,13 @@ def wait_for_amcl_stable(node: Node, amcl: AmclMonitor, timeout_sec: float = 25.
     send_status(node, "waiting_for_localization")
     amcl.reset_window()
 
-    start = node.get_clock().now()
+    # clock sampled as int nanoseconds: no Time/Duration objects per iteration
+    start_ns = node.get_clock().now().nanoseconds
     while rclpy.ok():
         rclpy.spin_once(node, timeout_sec=0.1)
-        now = node.get_clock().now()
+        now_ns = node.get_clock().now().nanoseconds
 
-        ok, reason = amcl.is_stable(now)
+        ok, reason = amcl.is_stable(now_ns)
         node.get_logger().info(f"[AMCL] {reason}")
 
         if ok:
@@ -289,7 +371,7 @@ def wait_for_amcl_stable(node: Node, amcl: AmclMonitor, timeout_sec: float = 25.
         if "unstable" in reason:
             amcl.reset_window()
 
-        if (now - start).nanoseconds / 1e9 > timeout_sec:
+        if (now_ns - start_ns) * 1e-9 > timeout_sec:
             node.get_logger().warn("[AMCL] Timeout: continuing anyway (not ideal).")
             send_status(node, "localization_timeout")
             return False
@@ -297,7 +379,7 @@ def wait_for_amcl_stable(node: Node, amcl: AmclMonitor, timeout_sec: float = 25.
 
 # ================== NAVIGATION ==================
 def try_reach_waypoint(navigator: BasicNavigator, wp_index: int, wp_id: str, pose: PoseStamped,
-                       amcl: AmclMonitor, home_xyq: XYQ) -> str:
+                       amcl: AmclMonitor, home_xyq: XYQ, control: ControlPoller) -> str:
     node: Node = navigator
 
     for attempt in range(1, MAX_WAYPOINT_RETRIES + 1):
@@ -327,7 +409,7 @@ def try_reach_waypoint(navigator: BasicNavigator, wp_index: int, wp_id: str, pos
         navigator.goToPose(pose)
 
         while not navigator.isTaskComplete():
-            cmd = check_control_command(node)
+            cmd = control.take_command()
             if cmd == "abort":
                 navigator.cancelTask()
                 send_status(node, "mission_aborted_by_operator",
@@ -338,7 +420,7 @@ def try_reach_waypoint(navigator: BasicNavigator, wp_index: int, wp_id: str, pos
                 send_status(node, "return_home_requested",
                             {"phase": "waypoint", "index": wp_index, "id": wp_id})
                 return "go_home"
-            rclpy.spin_once(node, timeout_sec=0.1)
+            rclpy.spin_once(node, timeout_sec=0.25)
 
         if navigator.getResult() == TaskResult.SUCCEEDED:
             send_status(node, "waypoint_reached", {"index": wp_index, "id": wp_id})
@@ -350,7 +432,8 @@ def try_reach_waypoint(navigator: BasicNavigator, wp_index: int, wp_id: str, pos
     return "unreachable"
 
 
-def go_home_with_control(navigator: BasicNavigator, home_pose: PoseStamped, label: str = "normal") -> str:
+def go_home_with_control(navigator: BasicNavigator, home_pose: PoseStamped, control: ControlPoller,
+                         label: str = "normal") -> str:
     node: Node = navigator
     send_status(node, "returning_home", {"mode": label})
 
@@ -367,12 +450,12 @@ def go_home_with_control(navigator: BasicNavigator, home_pose: PoseStamped, labe
     navigator.goToPose(home_pose)
 
     while not navigator.isTaskComplete():
-        cmd = check_control_command(node)
+        cmd = control.take_command()
         if cmd == "abort":
             navigator.cancelTask()
             send_status(node, "mission_aborted_by_operator", {"phase": "return_home", "mode": label})
             return "abort"
-        rclpy.spin_once(node, timeout_sec=0.1)
+        rclpy.spin_once(node, timeout_sec=0.25)
 
     if navigator.getResult() == TaskResult.SUCCEEDED:
         send_status(node, "mission_complete" if label == "normal" else "mission_complete_after_abort", {"mode": label})
@@ -383,23 +466,62 @@ def go_home_with_control(navigator: BasicNavigator, home_pose: PoseStamped, labe
 
 
 # ================== IMAGES ==================
-def capture_latest_image(node: Node) -> Optional["cv2.Mat"]:
-    global last_image_msg, bridge
-    start = node.get_clock().now()
+class CameraGrabber:
+    """
+    One persistent depth-1 camera subscription on its own node. That node is only spun
+    while grabbing, so frames are not dispatched while the robot is driving.
+    """
+    def __init__(self, node: Node):
+        self.node = node
+        self.msg: Optional[Image] = None
+        node.create_subscription(Image, CAMERA_TOPIC, self._on_image, camera_qos)
+
+    def _on_image(self, msg: Image):
+        self.msg = msg
+
+    def grab(self, timeout_sec: float) -> Optional[Image]:
+        """Wait for a frame taken after this call; None on timeout."""
+        # drop the frame left queued since the last grab
+        rclpy.spin_once(self.node, timeout_sec=0.0)
+        self.msg = None
+        deadline = time.monotonic() + timeout_sec
+        while self.msg is None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            rclpy.spin_once(self.node, timeout_sec=remaining)
+        return self.msg
+
+
+def capture_latest_image(node: Node, camera: CameraGrabber) -> Optional["cv2.Mat"]:
+    msg = camera.grab(CAMERA_TIMEOUT_SEC)
+    if msg is None:
+        node.get_logger().warn("[IMG] No camera frame.")
+        return None
 
-    while last_image_msg is None:
-        rclpy.spin_once(node, timeout_sec=0.1)
-        if (node.get_clock().now() - start).nanoseconds / 1e9 > CAMERA_TIMEOUT_SEC:
-            node.get_logger().warn("[IMG] No camera frame.")
-            return None
+    # 8-bit RGB/BGR: view the message buffer directly instead of a cv_bridge copy
+    if msg.encoding in ("bgr8", "rgb8"):
+        img = np.ndarray((msg.height, msg.width, 3), dtype=np.uint8, buffer=msg.data,
+                         strides=(msg.step, 3, 1))
+        if msg.encoding == "rgb8":
+            return cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
+        return img
 
     try:
-        return bridge.imgmsg_to_cv2(last_image_msg, desired_encoding="bgr8")
+        return bridge.imgmsg_to_cv2(msg, desired_encoding="bgr8")
     except Exception as e:
         node.get_logger().error(f"[IMG] cv_bridge failed: {e}")
         return None
 
 
+def encode_upload_jpeg(cv_img) -> Tuple[bool, "np.ndarray"]:
+    h, w = cv_img.shape[:2]
+    if w > UPLOAD_IMAGE_WIDTH:
+        size = (UPLOAD_IMAGE_WIDTH, max(1, round(h * UPLOAD_IMAGE_WIDTH / w)))
+        cv_img = cv2.resize(cv_img, size, interpolation=cv2.INTER_AREA)
+    return cv2.imencode(".jpg", cv_img, [cv2.IMWRITE_JPEG_QUALITY, UPLOAD_JPEG_QUALITY])
+
+
 def maybe_save_local(node: Node, local_path: str, cv_img) -> None:
     if not SAVE_LOCAL_IMAGES:
         return
@@ -414,14 +536,15 @@ def maybe_save_local(node: Node, local_path: str, cv_img) -> None:
         node.get_logger().warn(f"[IMG] Local save exception: {e}")
 
 
-def save_and_send_pictures_for_waypoint(node: Node, wp_index: int, wp_id: str):
+def save_and_send_pictures_for_waypoint(node: Node, camera: CameraGrabber, wp_index: int, wp_id: str):
     node.get_logger().info(f"[IMG] Waypoint {wp_index} ({wp_id}) capture. SAVE_LOCAL_IMAGES={SAVE_LOCAL_IMAGES}")
 
-    for img_idx in range(IMAGES_PER_WAYPOINT):
-        global last_image_msg
-        last_image_msg = None
+    # all images of the waypoint go up in one multipart request
+    files = []
+    data = [("waypoint_index", str(wp_index)), ("waypoint_id", wp_id)]
 
-        cv_img = capture_latest_image(node)
+    for img_idx in range(IMAGES_PER_WAYPOINT):
+        cv_img = capture_latest_image(node, camera)
         if cv_img is None:
             continue
 
@@ -429,21 +552,24 @@ def save_and_send_pictures_for_waypoint(node: Node, wp_index: int, wp_id: str):
         local_path = os.path.join(OUTPUT_DIR, local_name)
         maybe_save_local(node, local_path, cv_img)
 
-        ok, buf = cv2.imencode(".jpg", cv_img)
+        ok, buf = encode_upload_jpeg(cv_img)
         if not ok:
             node.get_logger().warn("[IMG] JPEG encode failed.")
             continue
 
-        files = {"image": (local_name.replace(".png", ".jpg"), buf.tobytes(), "image/jpeg")}
-        data = {"waypoint_index": str(wp_index), "waypoint_id": wp_id, "image_index": str(img_idx)}
-        try:
-            r = requests.post(f"{SERVER_BASE}/upload_photo", files=files, data=data, timeout=6.0)
-            if r.status_code != 200:
-                node.get_logger().warn(f"[IMG] upload failed {r.status_code}: {r.text}")
-        except Exception as e:
-            node.get_logger().warn(f"[IMG] upload failed: {e}")
+        # memoryview over the encoder output: the multipart body is built without an extra bytes copy
+        files.append(("image", (local_name.replace(".png", ".jpg"), buf.ravel().data, "image/jpeg")))
+        data.append(("image_index", str(img_idx)))
+
+    if not files:
+        return
 
-        time.sleep(0.2)
+    try:
+        r = http_session.post(f"{SERVER_BASE}/upload_photo_batch", files=files, data=data, timeout=6.0)
+        if r.status_code != 200:
+            node.get_logger().warn(f"[IMG] upload failed {r.status_code}: {r.text}")
+    except Exception as e:
+        node.get_logger().warn(f"[IMG] upload failed: {e}")
 
 
 # ================== MAIN ==================
@@ -453,11 +579,15 @@ def main():
     log = nav.get_logger()
 
     # subs
-    nav.create_subscription(Image, CAMERA_TOPIC, image_callback, 10)
-
     amcl = AmclMonitor()
     nav.create_subscription(PoseWithCovarianceStamped, AMCL_TOPIC,
-                            lambda m: amcl.update(m, nav.get_clock().now()), 10)
+                            lambda m: amcl.update(m, nav.get_clock().now().nanoseconds), 10)
+
+    # camera frames are only needed at waypoints: own node, spun only while grabbing
+    camera_node = rclpy.create_node("nav_mission_camera")
+    camera = CameraGrabber(camera_node)
+
+    control = ControlPoller(nav)
 
     # publisher to set /initialpose (fixes many “offset” cases)
     initialpose_pub = nav.create_publisher(PoseWithCovarianceStamped, INITIALPOSE_TOPIC, 10)
@@ -472,6 +602,7 @@ def main():
     except Exception as e:
         log.error(f"[POSE] {e}")
         send_status(nav, "pose_file_error", {"message": str(e)})
+        status_executor.shutdown(wait=True)
         rclpy.shutdown()
         return
 
@@ -484,12 +615,12 @@ def main():
     try:
         while rclpy.ok():
             # ---------- IDLE LOOP ----------
-            action = idle_loop_wait_for_start_or_go_home(nav)
+            action = idle_loop_wait_for_start_or_go_home(nav, control)
 
             # If operator pressed Go Home while idle:
             if action == "go_home":
                 # go-home should work even after abort
-                go_home_with_control(nav, home_pose, label="idle_go_home")
+                go_home_with_control(nav, home_pose, control, label="idle_go_home")
                 continue
 
             # ---------- START MISSION ----------
@@ -510,10 +641,10 @@ def main():
             force_go_home = False
 
             for i, (wp_id, wp_pose) in enumerate(waypoints):
-                res = try_reach_waypoint(nav, i, wp_id, wp_pose, amcl, home_xyq)
+                res = try_reach_waypoint(nav, i, wp_id, wp_pose, amcl, home_xyq, control)
 
                 if res == "success":
-                    save_and_send_pictures_for_waypoint(nav, i, wp_id)
+                    save_and_send_pictures_for_waypoint(nav, camera, i, wp_id)
                 elif res == "abort":
                     mission_aborted = True
                     log.warn("[MISSION] Aborted by operator. Staying idle (Go Home still works).")
@@ -529,7 +660,7 @@ def main():
                 continue
 
             # normal finish OR go_home command
-            home_res = go_home_with_control(nav, home_pose, label="normal")
+            home_res = go_home_with_control(nav, home_pose, control, label="normal")
             if home_res == "abort":
                 # aborted while returning home, stay idle
                 continue
@@ -537,6 +668,8 @@ def main():
     except KeyboardInterrupt:
         log.info("[MAIN] Ctrl+C")
     finally:
+        status_executor.shutdown(wait=True)
+        camera_node.destroy_node()
         rclpy.shutdown()
 
 
@@ -1,18 +1,84 @@
 #!/usr/bin/env python3
 from flask import (
-    Flask, request, jsonify, render_template_string, send_from_directory, abort
+    Flask, request, send_from_directory, abort
 )
+from werkzeug.utils import safe_join
 from datetime import datetime
 import os
+import re
+import time
 import uuid
 import json
+import bisect
+import threading
+import queue
+import sqlite3
+import gzip
+import shutil
+import hashlib
+import itertools
+from collections import OrderedDict, defaultdict
 
 app = Flask(__name__)
 
+# orjson (C extension, emits bytes) when installed; stdlib json otherwise
+try:
+    import orjson
+
+    def _json_bytes(data) -> bytes:
+        # status payloads / detections may carry numpy scalars or non-str keys
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+except ImportError:
+    def _json_bytes(data) -> bytes:
+        return json.dumps(data).encode("utf-8")
+
+
+def ojson(data, status: int = 200):
+    """Drop-in for jsonify(): JSON response serialized with orjson."""
+    return app.response_class(_json_bytes(data), status=status, mimetype="application/json")
+
+
+def json_etag(payload: bytes) -> str:
+    return hashlib.blake2b(payload, digest_size=8).hexdigest()
+
+
+def conditional_json(payload: bytes, etag: str = None):
+    """JSON response for dashboard polls: ETag'd, 304 when If-None-Match still matches."""
+    resp = app.response_class(payload, mimetype="application/json")
+    resp.set_etag(etag or json_etag(payload))
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp.make_conditional(request)
+
+
 # Load YOLO model globally (assuming it's available; adjust path as needed)
+MODEL_WEIGHTS = r"C:\Users\Administrator\Documents\Python\weights\best.pt"
+# Optional exports next to the weights, preferred when present (first found wins).
+# Export with a dynamic batch axis: the inference worker sends up to INFER_BATCH_SIZE (8)
+# photos per call, which a static batch-1 export rejects.
+#   best.engine  TensorRT INT8, NVIDIA GPU only:
+#                YOLO("best.pt").export(format="engine", int8=True, dynamic=True, batch=8, data="calib.yaml")
+#   best.onnx    onnxruntime (CUDAExecutionProvider if available):
+#                YOLO("best.pt").export(format="onnx", imgsz=640, dynamic=True, simplify=True)
+MODEL_ENGINE = os.path.splitext(MODEL_WEIGHTS)[0] + ".engine"
+MODEL_ONNX = os.path.splitext(MODEL_WEIGHTS)[0] + ".onnx"
+
+INFER_DEVICE = "cpu"
+INFER_HALF = False                  # FP16 inference, only when running the .pt on a GPU
+
 try:
     from ultralytics import YOLO
-    MODEL = YOLO(r"C:\Users\Administrator\Documents\Python\weights\best.pt")# Load a custom YOLO model
+    import cv2
+    import numpy as np
+    import torch
+    model_path = next((p for p in (MODEL_ENGINE, MODEL_ONNX) if os.path.isfile(p)), MODEL_WEIGHTS)
+    MODEL = YOLO(model_path, task="detect")  # Load a custom YOLO model
+    print(f"[SERVER] YOLO weights: {model_path}")
+    if torch.cuda.is_available():
+        INFER_DEVICE = 0
+        INFER_HALF = model_path == MODEL_WEIGHTS
+        # uploads all have the same shape (640x360 from the robot), so cuDNN's autotuned
+        # convs are picked once (warm-up) and reused
+        torch.backends.cudnn.benchmark = True
     print("[SERVER] YOLO model loaded successfully.")
 except Exception as e:
     print(f"[ERROR] Failed to load YOLO: {e}")
@@ -26,9 +92,24 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 BASE_SAVE_DIR = os.path.join(BASE_DIR, "received_photos")
 MISSIONS_DIR = os.path.join(BASE_DIR, "missions")
 
+MISSIONS_DB_PATH = os.path.join(MISSIONS_DIR, "missions.db")
+MISSION_CACHE_SIZE = 16             # most recent mission dicts kept in memory
+MISSIONS_LIST_LIMIT = 6             # newest missions returned by /missions (dashboard history panel)
+
+# /photo/ byte copying can be handed to a front-end server (leave off when standalone):
+#   nginx:  PHOTO_ACCEL_REDIRECT_PREFIX = "/photo-internal/" plus
+#           location /photo-internal/ { internal; alias <BASE_SAVE_DIR>/; }
+#   Apache: PHOTO_USE_X_SENDFILE = True (mod_xsendfile)
+PHOTO_ACCEL_REDIRECT_PREFIX = None
+PHOTO_USE_X_SENDFILE = False
+PHOTO_MAX_AGE_SEC = 31536000        # photo names are timestamped, files never change
+UPLOAD_COPY_CHUNK = 1 << 20         # 1 MiB: a whole upload JPEG per read/write
+
 os.makedirs(BASE_SAVE_DIR, exist_ok=True)
 os.makedirs(MISSIONS_DIR, exist_ok=True)
 
+app.use_x_sendfile = PHOTO_USE_X_SENDFILE
+
 # ============================================================
 # GLOBAL STATE
 # ============================================================
@@ -36,9 +117,163 @@ os.makedirs(MISSIONS_DIR, exist_ok=True)
 MISSION_STATE = "idle"              # "idle" or "start"
 LAST_STATUS = {}                    # last status JSON from robot
 CURRENT_MISSION_ID = None           # e.g. "mission_20251210_123456_ABCD12"
-MISSIONS = {}                       # mission_id -> mission dict
-CONTROL_COMMAND = "none"            # "none" | "abort" | "go_home"
+MISSIONS = OrderedDict()            # LRU cache: mission_id -> mission dict (source of truth: DB)
+_CMD_Q = queue.SimpleQueue()        # pending operator commands: "abort" | "go_home"
 LAST_TERMINAL_STATUS = None         # "mission_complete" | "home_unreachable" | "mission_aborted_by_operator"
+POLL_IDLE_ETAG = "idle"             # /poll ETag: no command / start pending
+
+# Latest photo / prediction per waypoint, filled in on upload so the dashboard polls
+# never scan the photo folders: mission_id -> {wp_folder: entry}
+_LATEST_PHOTO = defaultdict(dict)   # entry: {"url", "label"}
+_LATEST_PRED = defaultdict(dict)    # entry: {"url", "label", "detections"}
+_LATEST_LOCK = threading.Lock()
+_WP_DIRS = set()                    # waypoint folders already created (skip makedirs per upload)
+_IMG_COUNTER = itertools.count()    # photo filename suffix: unique even within the same second
+
+# Requests are served on threads: the globals above and the mission bookkeeping
+# (MISSIONS, DB, counters) are only touched under this lock. Re-entrant because
+# helpers nest. _LATEST_* use their own _LATEST_LOCK.
+_STATE_LOCK = threading.RLock()
+
+# Missions persist in sqlite (one row per mission, waypoint lists and last status as JSON);
+# the connection is shared between threads and only used under _STATE_LOCK.
+_DB = sqlite3.connect(MISSIONS_DB_PATH, check_same_thread=False)
+_DB.execute("""
+    CREATE TABLE IF NOT EXISTS missions (
+        id TEXT PRIMARY KEY,
+        started_at TEXT,
+        ended_at TEXT,
+        status TEXT,
+        waypoints_reached TEXT,
+        waypoints_unreachable TEXT,
+        images_count INTEGER,
+        last_status TEXT
+    )
+""")
+_DB.commit()
+_MISSION_COLUMNS = ("id, started_at, ended_at, status, waypoints_reached, "
+                    "waypoints_unreachable, images_count, last_status")
+
+# Serialized /missions payload and its ETag, rebuilt on the first poll after any mission write
+_MISSIONS_CACHE = None              # (payload_bytes, etag)
+
+
+# ============================================================
+# YOLO INFERENCE WORKER
+# ============================================================
+# Uploads only queue their photo; one inference thread collects queued photos (up to
+# INFER_BATCH_SIZE, or whatever arrived within INFER_BATCH_WAIT_SEC of the first) into
+# a single batched MODEL call and writes the predictions, so the robot's upload
+# returns as soon as the JPEG is on disk.
+
+INFER_BATCH_SIZE = 8
+INFER_BATCH_WAIT_SEC = 0.05
+PRED_JPEG_QUALITY = 82
+# Warm-up frame matching the robot's uploads (UPLOAD_IMAGE_WIDTH=640, 16:9 camera), so
+# it letterboxes to the same 640x384 input as real photos and cuDNN doesn't re-tune on them
+WARMUP_IMAGE_WIDTH = 640
+WARMUP_IMAGE_HEIGHT = 360
+_INFER_Q = queue.Queue(maxsize=32)  # (mission_id, wp_folder_name, wp_folder_path, filename, image_index)
+
+
+def _drop_page_cache(path: str):
+    """Tell the kernel a photo won't be read again soon (Linux only; no-op elsewhere)."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    except (AttributeError, OSError):
+        pass
+    finally:
+        os.close(fd)
+
+
+def _save_prediction(job: tuple, results):
+    mission_id, wp_folder_name, wp_folder_path, filename, image_index = job
+
+    # Encode the annotated frame YOLO already holds in memory; results.save() would
+    # re-read and re-decode the source photo first
+    pred_filename = f"pred_{filename}"
+    pred_path = os.path.join(wp_folder_path, pred_filename)
+    ok, buf = cv2.imencode(".jpg", results.plot(), [cv2.IMWRITE_JPEG_QUALITY, PRED_JPEG_QUALITY])
+    if not ok:
+        raise RuntimeError(f"JPEG encode failed for {pred_filename}")
+    with open(pred_path, "wb") as f:
+        f.write(buf.tobytes())
+    print(f"[YOLO_SAVE] {pred_path}")
+
+    # Save detected classes as JSON
+    detected = []
+    if results.boxes:
+        detected = list(set(results.names[int(cls)] for cls in results.boxes.cls))
+    dets_path = os.path.join(wp_folder_path, f"pred_dets_{image_index}.json")
+    with open(dets_path, "wb") as f:
+        f.write(_json_bytes(detected))
+    print(f"[DETS_SAVE] {dets_path} - {detected}")
+
+    with _LATEST_LOCK:
+        _LATEST_PRED[mission_id][wp_folder_name] = {
+            "url": f"/photo/{mission_id}/{wp_folder_name}/{pred_filename}",
+            "label": f"{wp_folder_name} · {filename}",
+            "detections": detected,
+        }
+
+
+def _infer_worker():
+    # Warm-up pass (CUDA init, cuDNN autotune) here rather than at import, so the
+    # server starts answering right away and the first real photo doesn't pay for it
+    try:
+        MODEL.predict(np.zeros((WARMUP_IMAGE_HEIGHT, WARMUP_IMAGE_WIDTH, 3), dtype=np.uint8),
+                      device=INFER_DEVICE, half=INFER_HALF, verbose=False)
+        print("[SERVER] YOLO warm-up done.")
+    except Exception as e:
+        print(f"[YOLO_ERROR] warm-up failed: {e}")
+
+    while True:
+        jobs = [_INFER_Q.get()]
+        deadline = time.monotonic() + INFER_BATCH_WAIT_SEC
+        while len(jobs) < INFER_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                jobs.append(_INFER_Q.get(timeout=remaining))
+            except queue.Empty:
+                break
+        try:
+            paths = [os.path.join(job[2], job[3]) for job in jobs]
+            # batch= is required: predict() defaults to batch=1 and would run one forward pass per path
+            results_list = MODEL(paths, batch=len(paths), device=INFER_DEVICE, half=INFER_HALF, verbose=False)
+        except Exception as e:
+            print(f"[YOLO_ERROR] {e}")
+            continue
+        # match results to jobs by path, not position: the loader skips photos it can't
+        # decode, which would shift every later prediction onto the wrong photo
+        by_path = {os.path.abspath(r.path): r for r in results_list}
+        for job, path in zip(jobs, paths):
+            results = by_path.get(os.path.abspath(path))
+            if results is None:
+                print(f"[YOLO_ERROR] no result for {path} (unreadable image?)")
+            else:
+                try:
+                    _save_prediction(job, results)
+                except Exception as e:
+                    print(f"[YOLO_ERROR] {e}")
+            _drop_page_cache(path)   # source photo is archive data from here on
+
+
+def _enqueue_prediction(job: tuple):
+    """Queue a saved photo for YOLO; drops it (photo kept, no prediction) if the queue is full."""
+    try:
+        _INFER_Q.put_nowait(job)
+    except queue.Full:
+        print(f"[YOLO_SKIP] inference queue full, no prediction for {job[3]}")
+
+
+if MODEL:
+    threading.Thread(target=_infer_worker, name="yolo-infer", daemon=True).start()
 
 
 # ============================================================
@@ -51,98 +286,219 @@ def _new_mission_id() -> str:
     return f"mission_{ts}_{short}"
 
 
+def _mission_from_row(row: tuple) -> dict:
+    reached = json.loads(row[4])
+    unreachable = json.loads(row[5])
+    return {
+        "id": row[0],
+        "started_at": row[1],
+        "ended_at": row[2],
+        "status": row[3],
+        "waypoints_reached": reached,
+        "waypoints_unreachable": unreachable,
+        "waypoints_reached_set": set(reached),
+        "waypoints_unreachable_set": set(unreachable),
+        "images_count": row[6],
+        "last_status": json.loads(row[7]),
+    }
+
+
+def _insert_mission(mission: dict):
+    """Create the mission's row (once, at mission start) and mark it most recently used."""
+    _DB.execute(
+        f"INSERT INTO missions ({_MISSION_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            mission["id"],
+            mission["started_at"],
+            mission["ended_at"],
+            mission["status"],
+            json.dumps(mission["waypoints_reached"]),
+            json.dumps(mission["waypoints_unreachable"]),
+            mission["images_count"],
+            json.dumps(mission["last_status"]),
+        ),
+    )
+    _mission_written(mission)
+
+
+def _save_mission(mission: dict):
+    """Write the mission's mutable columns through to its existing row (rowid is kept)."""
+    _DB.execute(
+        "UPDATE missions SET ended_at = ?, status = ?, waypoints_reached = ?, "
+        "waypoints_unreachable = ?, images_count = ?, last_status = ? WHERE id = ?",
+        (
+            mission["ended_at"],
+            mission["status"],
+            json.dumps(mission["waypoints_reached"]),
+            json.dumps(mission["waypoints_unreachable"]),
+            mission["images_count"],
+            json.dumps(mission["last_status"]),
+            mission["id"],
+        ),
+    )
+    _mission_written(mission)
+
+
+def _save_mission_images(mission: dict):
+    """Per-upload write: only the image counter and status change."""
+    _DB.execute(
+        "UPDATE missions SET images_count = ?, status = ? WHERE id = ?",
+        (mission["images_count"], mission["status"], mission["id"]),
+    )
+    _mission_written(mission)
+
+
+def _mission_written(mission: dict):
+    global _MISSIONS_CACHE
+    _DB.commit()
+    _cache_mission(mission)
+    _MISSIONS_CACHE = None
+
+
+def _cache_mission(mission: dict):
+    MISSIONS[mission["id"]] = mission
+    MISSIONS.move_to_end(mission["id"])
+    while len(MISSIONS) > MISSION_CACHE_SIZE:
+        MISSIONS.popitem(last=False)
+
+
+def _get_mission(mission_id: str):
+    """Mission dict from the in-memory cache, loading it from the DB on a miss."""
+    mission = MISSIONS.get(mission_id)
+    if mission is not None:
+        MISSIONS.move_to_end(mission_id)
+        return mission
+    row = _DB.execute(f"SELECT {_MISSION_COLUMNS} FROM missions WHERE id = ?", (mission_id,)).fetchone()
+    if row is None:
+        return None
+    mission = _mission_from_row(row)
+    _cache_mission(mission)
+    return mission
+
+
 def _start_new_mission() -> str:
     """Create and register a new mission, set as current."""
     global CURRENT_MISSION_ID, MISSIONS, LAST_TERMINAL_STATUS
 
-    mission_id = _new_mission_id()
-    now = datetime.now().isoformat(timespec="seconds")
-
-    MISSIONS[mission_id] = {
-        "id": mission_id,
-        "started_at": now,
-        "ended_at": None,
-        "status": "pending",  # pending|running|complete|home_unreachable|aborted
-        "waypoints_reached": set(),
-        "waypoints_unreachable": set(),
-        "images_count": 0,
-        "last_status": None,
-    }
-    CURRENT_MISSION_ID = mission_id
-    LAST_TERMINAL_STATUS = None
+    with _STATE_LOCK:
+        mission_id = _new_mission_id()
+        now = datetime.now().isoformat(timespec="seconds")
+
+        mission = {
+            "id": mission_id,
+            "started_at": now,
+            "ended_at": None,
+            "status": "pending",  # pending|running|complete|home_unreachable|aborted
+            "waypoints_reached": [],          # kept sorted, see _mark_waypoint
+            "waypoints_unreachable": [],
+            "waypoints_reached_set": set(),   # dedup companions of the sorted lists
+            "waypoints_unreachable_set": set(),
+            "images_count": 0,
+            "last_status": None,
+        }
+        _insert_mission(mission)
+        CURRENT_MISSION_ID = mission_id
+        LAST_TERMINAL_STATUS = None
+
+        # the dashboard only shows the current mission's photos: forget older ones so the
+        # indexes stay bounded (a late upload/prediction is dropped at the next start)
+        with _LATEST_LOCK:
+            _LATEST_PHOTO.clear()
+            _LATEST_PRED.clear()
+        _WP_DIRS.clear()
+
+        print(f"[SERVER] New mission created: {mission_id}")
+        return mission_id
 
-    print(f"[SERVER] New mission created: {mission_id}")
-    return mission_id
+
+def _mark_waypoint(mission: dict, key: str, idx: int):
+    """Insert idx into the sorted list mission[key] once, so summaries never re-sort."""
+    seen = mission[f"{key}_set"]
+    if idx in seen:
+        return
+    seen.add(idx)
+    bisect.insort(mission[key], idx)
 
 
 def _update_mission_on_status(status_payload: dict):
     """Update mission data based on status from the robot."""
     global CURRENT_MISSION_ID, MISSIONS, LAST_TERMINAL_STATUS
 
-    if not CURRENT_MISSION_ID:
-        if status_payload.get("status") == "mission_started":
-            _start_new_mission()
-        else:
+    with _STATE_LOCK:
+        mission_id = CURRENT_MISSION_ID
+        if not mission_id:
+            if status_payload.get("status") == "mission_started":
+                mission_id = _start_new_mission()
+            else:
+                return
+
+        mission = _get_mission(mission_id)
+        if mission is None:
             return
 
-    mission = MISSIONS.get(CURRENT_MISSION_ID)
-    if mission is None:
-        return
+        mission["last_status"] = status_payload
+        status = status_payload.get("status", "")
+        now = datetime.now().isoformat(timespec="seconds")
 
-    mission["last_status"] = status_payload
-    status = status_payload.get("status", "")
-    now = datetime.now().isoformat(timespec="seconds")
+        if status == "mission_started":
+            mission["status"] = "running"
 
-    if status == "mission_started":
-        mission["status"] = "running"
+        if status == "waypoint_reached":
+            idx = status_payload.get("index")
+            if idx is not None:
+                _mark_waypoint(mission, "waypoints_reached", int(idx))
+        elif status == "waypoint_unreachable":
+            idx = status_payload.get("index")
+            if idx is not None:
+                _mark_waypoint(mission, "waypoints_unreachable", int(idx))
 
-    if status == "waypoint_reached":
-        idx = status_payload.get("index")
-        if idx is not None:
-            mission["waypoints_reached"].add(int(idx))
-    elif status == "waypoint_unreachable":
-        idx = status_payload.get("index")
-        if idx is not None:
-            mission["waypoints_unreachable"].add(int(idx))
+        if status in ("mission_complete", "mission_complete_after_abort"):
+            mission["status"] = "complete"
+            mission["ended_at"] = now
+            LAST_TERMINAL_STATUS = "mission_complete"
 
-    if status in ("mission_complete", "mission_complete_after_abort"):
-        mission["status"] = "complete"
-        mission["ended_at"] = now
-        LAST_TERMINAL_STATUS = "mission_complete"
+        elif status.startswith("home_unreachable"):
+            mission["status"] = "home_unreachable"
+            mission["ended_at"] = now
+            LAST_TERMINAL_STATUS = "home_unreachable"
 
-    elif status.startswith("home_unreachable"):
-        mission["status"] = "home_unreachable"
-        mission["ended_at"] = now
-        LAST_TERMINAL_STATUS = "home_unreachable"
+        elif status == "mission_aborted_by_operator":
+            mission["status"] = "aborted"
+            mission["ended_at"] = now
+            LAST_TERMINAL_STATUS = "mission_aborted_by_operator"
 
-    elif status == "mission_aborted_by_operator":
-        mission["status"] = "aborted"
-        mission["ended_at"] = now
-        LAST_TERMINAL_STATUS = "mission_aborted_by_operator"
+        _save_mission(mission)
 
 
-def _register_image_for_current_mission():
-    """Increment image counter for current mission."""
+def _register_image_for_current_mission() -> str:
+    """Increment image counter for current mission. Returns the mission id used."""
     global CURRENT_MISSION_ID, MISSIONS
-    if not CURRENT_MISSION_ID:
-        _start_new_mission()
-    mission = MISSIONS.get(CURRENT_MISSION_ID)
-    if mission is None:
-        return
-    mission["images_count"] += 1
-    if mission["status"] == "pending":
-        mission["status"] = "running"
+    with _STATE_LOCK:
+        mission_id = CURRENT_MISSION_ID or _start_new_mission()
+        mission = _get_mission(mission_id)
+        if mission is None:
+            return mission_id
+        mission["images_count"] += 1
+        if mission["status"] == "pending":
+            mission["status"] = "running"
+        _save_mission_images(mission)
+        return mission_id
+
 
+_SUMMARY_COLUMNS = ("id, started_at, ended_at, status, waypoints_reached, "
+                    "waypoints_unreachable, images_count")
 
-def _mission_summary(mission: dict) -> dict:
+
+def _mission_summary(row: tuple) -> dict:
+    """Dashboard list entry straight from a _SUMMARY_COLUMNS row (last_status is not decoded)."""
     return {
-        "id": mission["id"],
-        "started_at": mission["started_at"],
-        "ended_at": mission["ended_at"],
-        "status": mission["status"],
-        "waypoints_reached": sorted(list(mission["waypoints_reached"])),
-        "waypoints_unreachable": sorted(list(mission["waypoints_unreachable"])),
-        "images_count": mission["images_count"],
+        "id": row[0],
+        "started_at": row[1],
+        "ended_at": row[2],
+        "status": row[3],
+        "waypoints_reached": json.loads(row[4]),
+        "waypoints_unreachable": json.loads(row[5]),
+        "images_count": row[6],
     }
 
 
@@ -449,6 +805,16 @@ INDEX_HTML = """<!doctype html>
     </div>
 
     <script>
+      // Conditional GET: resend the last ETag per URL; a 304 means "unchanged", skip re-render
+      const etags={};
+      async function getJSON(url){
+        const headers=etags[url]?{'If-None-Match':etags[url]}:{};
+        const r=await fetch(url,{cache:'no-store',headers});
+        if(r.status===304||!r.ok) return null;
+        etags[url]=r.headers.get('ETag');
+        return r.json();
+      }
+
       async function startMission(){ try{ await fetch('/start_mission',{method:'POST'});}catch(e){console.error(e);}}
       async function abortMission(){ try{ await fetch('/abort_mission',{method:'POST'});}catch(e){console.error(e);}}
       async function returnHome(){ try{ await fetch('/return_home',{method:'POST'});}catch(e){console.error(e);}}
@@ -524,8 +890,7 @@ INDEX_HTML = """<!doctype html>
 
       async function pollStatus(){
         try{
-          const r=await fetch('/last_status'); if(!r.ok) return;
-          const js=await r.json();
+          const js=await getJSON('/last_status'); if(!js) return;
 
           const status=js.status || 'mission_idle';
           const terminal=js.terminal_status || '';
@@ -564,15 +929,15 @@ INDEX_HTML = """<!doctype html>
 
       async function pollMissions(){
         try{
-          const r=await fetch('/missions'); if(!r.ok) return;
-          const js=await r.json(); const missions=js.missions || [];
+          const js=await getJSON('/missions'); if(!js) return;
+          const missions=js.missions || [];
           const list=document.getElementById('mission-list'); list.innerHTML='';
           if(!missions.length){
             const li=document.createElement('li');
             li.className='mission-item'; li.textContent='No missions recorded yet.';
             list.appendChild(li); return;
           }
-          missions.slice(-6).reverse().forEach(m=>{
+          missions.forEach(m=>{   // newest first, already limited server-side
             const li=document.createElement('li'); li.className='mission-item';
             const spanId=document.createElement('span'); spanId.className='mission-id'; spanId.textContent=m.id;
             const badge=document.createElement('span'); badge.className='badge ' + badgeClass(m.status); badge.textContent=m.status.toUpperCase();
@@ -590,8 +955,8 @@ INDEX_HTML = """<!doctype html>
 
       async function pollThumbnails(){
         try{
-          const r=await fetch('/latest_photos'); if(!r.ok) return;
-          const js=await r.json(); const grid=document.getElementById('thumb-grid'); grid.innerHTML='';
+          const js=await getJSON('/latest_photos'); if(!js) return;
+          const grid=document.getElementById('thumb-grid'); grid.innerHTML='';
           const items=js.photos || [];
           if(!items.length){
             const card=document.createElement('div'); card.className='thumb-card';
@@ -609,8 +974,8 @@ INDEX_HTML = """<!doctype html>
 
       async function pollPredictions(){
         try{
-          const r=await fetch('/latest_predictions'); if(!r.ok) return;
-          const js=await r.json(); const grid=document.getElementById('pred-grid'); grid.innerHTML='';
+          const js=await getJSON('/latest_predictions'); if(!js) return;
+          const grid=document.getElementById('pred-grid'); grid.innerHTML='';
           const items=js.photos || [];
           if(!items.length){
             const card=document.createElement('div'); card.className='thumb-card';
@@ -628,11 +993,17 @@ INDEX_HTML = """<!doctype html>
         }catch(e){ console.error('pollPredictions', e); }
       }
 
-      setInterval(pollStatus,1500);
-      setInterval(pollMissions,3000);
-      setInterval(pollThumbnails,3500);
-      setInterval(pollPredictions,3500);
-      pollStatus(); pollMissions(); pollThumbnails(); pollPredictions();
+      // One scheduler for all polls: status every tick, the rest every other tick,
+      // and back off while the tab is hidden.
+      let tickCount=0;
+      async function tick(){
+        const polls=[pollStatus()];
+        if(tickCount%2===0) polls.push(pollMissions(), pollThumbnails(), pollPredictions());
+        tickCount++;
+        await Promise.all(polls);
+        setTimeout(tick, document.hidden?10000:1500);
+      }
+      tick();
     </script>
   </body>
 </html>
@@ -643,239 +1014,291 @@ INDEX_HTML = """<!doctype html>
 # ROUTES
 # ============================================================
 
+# The dashboard has no template variables: compile and render it once at import
+# instead of render_template_string() re-parsing it on every GET /.
+INDEX_HTML_RENDERED = app.jinja_env.from_string(INDEX_HTML).render()
+
+def _minify_html(html: str) -> str:
+    """
+    Conservative minify: drop HTML comments, indentation and blank lines. Line breaks
+    are kept, so the inline JS (// comments, no semicolons needed) stays valid.
+    """
+    html = re.sub(r"<!--.*?-->", "", html, flags=re.S)
+    return "\n".join(line.strip() for line in html.splitlines() if line.strip())
+
+
+# ...and since it is static, minify, encode, gzip and fingerprint it once too
+INDEX_HTML_BYTES = _minify_html(INDEX_HTML_RENDERED).encode("utf-8")
+INDEX_HTML_GZ = gzip.compress(INDEX_HTML_BYTES, compresslevel=9)
+INDEX_ETAG = hashlib.md5(INDEX_HTML_GZ).hexdigest()
+
+
 @app.route("/")
 def index():
-    return render_template_string(INDEX_HTML)
+    use_gzip = request.accept_encodings["gzip"] > 0
+    etag = INDEX_ETAG + ("-gz" if use_gzip else "")
+
+    if request.if_none_match.contains(etag):
+        resp = app.response_class(status=304)
+    elif use_gzip:
+        resp = app.response_class(INDEX_HTML_GZ, mimetype="text/html")
+        resp.headers["Content-Encoding"] = "gzip"
+    else:
+        resp = app.response_class(INDEX_HTML_BYTES, mimetype="text/html")
+
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "public, max-age=3600"
+    resp.headers["Vary"] = "Accept-Encoding"
+    return resp
 
 
 @app.route("/start_mission", methods=["POST"])
 def start_mission():
     global MISSION_STATE, LAST_STATUS, LAST_TERMINAL_STATUS
-    MISSION_STATE = "start"
-    mission_id = _start_new_mission()
-    LAST_STATUS.setdefault("status", "mission_idle")
-    LAST_STATUS["mission_id"] = mission_id
-    LAST_TERMINAL_STATUS = None
+    with _STATE_LOCK:
+        MISSION_STATE = "start"
+        mission_id = _start_new_mission()
+        LAST_STATUS.setdefault("status", "mission_idle")
+        LAST_STATUS["mission_id"] = mission_id
+        LAST_TERMINAL_STATUS = None
     print("[SERVER] Mission start requested via UI")
-    return jsonify({"ok": True, "mission_id": mission_id})
+    return ojson({"ok": True, "mission_id": mission_id})
 
 
 @app.route("/mission_state", methods=["GET"])
 def mission_state():
     global MISSION_STATE
-    state = MISSION_STATE
-    if MISSION_STATE == "start":
-        MISSION_STATE = "idle"   # one-shot
-    return jsonify({"mission_state": state})
+    with _STATE_LOCK:
+        state = MISSION_STATE
+        if MISSION_STATE == "start":
+            MISSION_STATE = "idle"   # one-shot
+    return ojson({"mission_state": state})
+
+
+def _take_command() -> str:
+    """Pop the next operator command (one-shot); "none" when nothing is pending."""
+    try:
+        return _CMD_Q.get_nowait()
+    except queue.Empty:
+        return "none"
 
 
 @app.route("/abort_mission", methods=["POST"])
 def abort_mission():
-    global CONTROL_COMMAND
-    CONTROL_COMMAND = "abort"
+    _CMD_Q.put("abort")
     print("[SERVER] Abort requested by operator")
-    return jsonify({"ok": True, "command": "abort"})
+    return ojson({"ok": True, "command": "abort"})
 
 
 @app.route("/return_home", methods=["POST"])
 def return_home():
-    global CONTROL_COMMAND
-    CONTROL_COMMAND = "go_home"
+    _CMD_Q.put("go_home")
     print("[SERVER] Return-home requested by operator")
-    return jupytext({"ok": True, "command": "go_home"})
+    return ojson({"ok": True, "command": "go_home"})
 
 
 @app.route("/control_state", methods=["GET"])
 def control_state():
-    global CONTROL_COMMAND
-    cmd = CONTROL_COMMAND
-    CONTROL_COMMAND = "none"   # one-shot
-    return jsonify({"command": cmd})
+    return ojson({"command": _take_command()})
+
+
+@app.route("/poll", methods=["GET"])
+def poll():
+    """
+    Robot poll: control command + mission state in one round-trip (both one-shot).
+    Every 200 consumes both flags, so its ETag always means "nothing pending"; while
+    that still holds, a matching If-None-Match gets an empty 304.
+    """
+    global MISSION_STATE
+    with _STATE_LOCK:
+        if (_CMD_Q.empty() and MISSION_STATE != "start"
+                and request.if_none_match.contains(POLL_IDLE_ETAG)):
+            resp = app.response_class(status=304)
+            resp.set_etag(POLL_IDLE_ETAG)
+            return resp
+
+        cmd = _take_command()
+        state = MISSION_STATE
+        if MISSION_STATE == "start":
+            MISSION_STATE = "idle"
+    resp = ojson({"command": cmd, "mission_state": state})
+    resp.set_etag(POLL_IDLE_ETAG)
+    return resp
 
 
 @app.route("/status_update", methods=["POST"])
 def status_update():
-    global LAST_STATUS, MISSION_STATE
+    global LAST_STATUS
     try:
         payload = request.get_json(force=True) or {}
     except Exception:
         payload = {"status": "bad_status_payload"}
 
-    status = payload.get("status", "")
-
-    if status == "mission_idle":
-        MISSION_STATE = "idle"
+    # no MISSION_STATE reset on "mission_idle": statuses are posted asynchronously and can
+    # land after a fresh Start; the robot itself drops starts latched before going idle
+    with _STATE_LOCK:
+        payload.setdefault("mission_state", MISSION_STATE)
+        payload.setdefault("mission_id", CURRENT_MISSION_ID or "—")
 
-    payload.setdefault("mission_state", MISSION_STATE)
-    payload.setdefault("mission_id", CURRENT_MISSION_ID or "—")
-
-    LAST_STATUS = payload
-    print("[STATUS]", LAST_STATUS)
-
-    _update_mission_on_status(payload)
-    return jsonify({"ok": True})
+        LAST_STATUS = payload
+        _update_mission_on_status(payload)
+    print("[STATUS]", payload)
+    return ojson({"ok": True})
 
 
 @app.route("/last_status", methods=["GET"])
 def last_status():
     global LAST_STATUS, LAST_TERMINAL_STATUS
-    if not LAST_STATUS:
-        return jsonify({
-            "status": "no_status_yet",
-            "mission_state": MISSION_STATE,
-            "mission_id": CURRENT_MISSION_ID or "—",
-            "terminal_status": LAST_TERMINAL_STATUS,
-        })
-    if "mission_state" not in LAST_STATUS:
-        LAST_STATUS["mission_state"] = MISSION_STATE
-    if "mission_id" not in LAST_STATUS:
-        LAST_STATUS["mission_id"] = CURRENT_MISSION_ID or "—"
-    LAST_STATUS["terminal_status"] = LAST_TERMINAL_STATUS
-    return jsonify(LAST_STATUS)
+    with _STATE_LOCK:
+        if not LAST_STATUS:
+            payload = _json_bytes({
+                "status": "no_status_yet",
+                "mission_state": MISSION_STATE,
+                "mission_id": CURRENT_MISSION_ID or "—",
+                "terminal_status": LAST_TERMINAL_STATUS,
+            })
+        else:
+            if "mission_state" not in LAST_STATUS:
+                LAST_STATUS["mission_state"] = MISSION_STATE
+            if "mission_id" not in LAST_STATUS:
+                LAST_STATUS["mission_id"] = CURRENT_MISSION_ID or "—"
+            LAST_STATUS["terminal_status"] = LAST_TERMINAL_STATUS
+            payload = _json_bytes(LAST_STATUS)
+    return conditional_json(payload)
 
 
 @app.route("/missions", methods=["GET"])
 def missions():
-    items = [_mission_summary(m) for m in MISSIONS.values()]
-    items_sorted = sorted(items, key=lambda x: x["started_at"] or "", reverse=True)
-    return jsonify({"missions": items_sorted})
+    global _MISSIONS_CACHE
+    with _STATE_LOCK:
+        if _MISSIONS_CACHE is None:
+            rows = _DB.execute(
+                f"SELECT {_SUMMARY_COLUMNS} FROM missions ORDER BY started_at DESC, rowid DESC LIMIT ?",
+                (MISSIONS_LIST_LIMIT,),
+            ).fetchall()
+            items_sorted = [_mission_summary(row) for row in rows]
+            payload = _json_bytes({"missions": items_sorted})
+            _MISSIONS_CACHE = (payload, json_etag(payload))
+        payload, etag = _MISSIONS_CACHE
+    return conditional_json(payload, etag)
+
+
+def _latest_entries(index: dict, mission_id) -> list:
+    if not mission_id:
+        return []
+    with _LATEST_LOCK:
+        return list(index.get(mission_id, {}).values())[-8:]
 
 
 @app.route("/latest_photos", methods=["GET"])
 def latest_photos():
-    photos = []
-    if not CURRENT_MISSION_ID:
-        return jsonify({"photos": photos})
-
-    mission_root = os.path.join(BASE_SAVE_DIR, CURRENT_MISSION_ID)
-    if not os.path.isdir(mission_root):
-        return jsonify({"photos": photos})
-
-    for wp_name in sorted(os.listdir(mission_root)):
-        wp_path = os.path.join(mission_root, wp_name)
-        if not os.path.isdir(wp_path):
-            continue
-        files = [f for f in sorted(os.listdir(wp_path)) if f.startswith("img") and f.endswith(".jpg")]
-        if not files:
-            continue
-        last_file = files[-1]
-        url = f"/photo/{CURRENT_MISSION_ID}/{wp_name}/{last_file}"
-        label = f"{wp_name} · {last_file}"
-        photos.append({"url": url, "label": label})
-
-    photos = photos[-8:]
-    return jsonify({"photos": photos})
+    return conditional_json(_json_bytes({"photos": _latest_entries(_LATEST_PHOTO, CURRENT_MISSION_ID)}))
 
 
 @app.route("/latest_predictions", methods=["GET"])
 def latest_predictions():
-    photos = []
-    if not CURRENT_MISSION_ID:
-        return jsonify({"photos": photos})
-
-    mission_root = os.path.join(BASE_SAVE_DIR, CURRENT_MISSION_ID)
-    if not os.path.isdir(mission_root):
-        return jsonify({"photos": photos})
-
-    for wp_name in sorted(os.listdir(mission_root)):
-        wp_path = os.path.join(mission_root, wp_name)
-        if not os.path.isdir(wp_path):
-            continue
-        files = [f for f in sorted(os.listdir(wp_path)) if f.startswith("pred_") and f.endswith(".jpg")]
-        if not files:
-            continue
-        last_file = files[-1]
-        # Extract image_index from last_file (e.g., pred_img3_20240114_124600.jpg -> image_index=3)
-        try:
-            img_part = last_file.split('_')[1]  # 'img3'
-            image_index = img_part[3:]  # '3'
-        except Exception:
-            image_index = "unknown"
-        url = f"/photo/{CURRENT_MISSION_ID}/{wp_name}/{last_file}"
-        label = f"{wp_name} · {last_file.replace('pred_', '')}"
-        # Load detections if available
-        dets_file = f"pred_dets_{image_index}.json"
-        dets_path = os.path.join(wp_path, dets_file)
-        detections = []
-        if os.path.isfile(dets_path):
-            with open(dets_path, "r") as f:
-                detections = json.load(f)
-        photos.append({"url": url, "label": label, "detections": detections})
-
-    photos = photos[-8:]
-    return jsonify({"photos": photos})
+    return conditional_json(_json_bytes({"photos": _latest_entries(_LATEST_PRED, CURRENT_MISSION_ID)}))
 
 
 @app.route("/photo/<mission_id>/<wp_folder>/<filename>")
 def serve_photo(mission_id, wp_folder, filename):
-    folder = os.path.join(BASE_SAVE_DIR, mission_id, wp_folder)
-    full_path = os.path.join(folder, filename)
-    print(f"[PHOTO_REQ] mission={mission_id} wp={wp_folder} file={filename}")
-    print(f"           -> FS path: {full_path}")
+    rel_path = f"{mission_id}/{wp_folder}/{filename}"
+    full_path = safe_join(BASE_SAVE_DIR, mission_id, wp_folder, filename)
+    if app.debug:
+        print(f"[PHOTO_REQ] mission={mission_id} wp={wp_folder} file={filename} -> {full_path}")
 
-    if not os.path.isfile(full_path):
-        print("[PHOTO_REQ] FILE NOT FOUND")
+    if full_path is None or not os.path.isfile(full_path):
         abort(404)
 
-    return send_from_directory(folder, filename)
-
-
-@app.route("/upload_photo", methods=["POST"])
-def upload_photo():
-    waypoint_index = request.form.get("waypoint_index", "unknown")
-    image_index = request.form.get("image_index", "0")
-    file = request.files.get("image")
+    if PHOTO_ACCEL_REDIRECT_PREFIX:
+        resp = app.response_class(mimetype="image/jpeg")
+        resp.headers["X-Accel-Redirect"] = PHOTO_ACCEL_REDIRECT_PREFIX + rel_path
+    else:
+        resp = send_from_directory(BASE_SAVE_DIR, rel_path, conditional=True, max_age=PHOTO_MAX_AGE_SEC)
+    resp.headers["Cache-Control"] = f"public, max-age={PHOTO_MAX_AGE_SEC}, immutable"
+    return resp
 
-    if file is None:
-        return jsonify({"status": "error", "message": "no image field"}), 400
 
-    _register_image_for_current_mission()
-    mission_id = CURRENT_MISSION_ID or "nomission"
+def _save_uploaded_photo(file, waypoint_index: str, image_index: str) -> dict:
+    """Store one uploaded image for the current mission and queue it for YOLO."""
+    mission_id = _register_image_for_current_mission() or "nomission"
 
     mission_folder = os.path.join(BASE_SAVE_DIR, mission_id)
     wp_folder_name = f"wp{waypoint_index}"
     wp_folder_path = os.path.join(mission_folder, wp_folder_name)
-    os.makedirs(wp_folder_path, exist_ok=True)
+    if wp_folder_path not in _WP_DIRS:
+        os.makedirs(wp_folder_path, exist_ok=True)
+        _WP_DIRS.add(wp_folder_path)
 
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"img{image_index}_{ts}.jpg"
+    ts = time.strftime("%Y%m%d_%H%M%S")
+    filename = f"img{image_index}_{ts}_{next(_IMG_COUNTER) & 0xffff:04x}.jpg"
     full_path = os.path.join(wp_folder_path, filename)
 
-    file.save(full_path)
+    # 1 MiB copy chunks: one read/write pair per photo (BufferedWriter passes them
+    # straight through and retries short writes)
+    with open(full_path, "wb") as dst:
+        shutil.copyfileobj(file.stream, dst, length=UPLOAD_COPY_CHUNK)
     print(f"[PHOTO_SAVE] {full_path}")
+    with _LATEST_LOCK:
+        _LATEST_PHOTO[mission_id][wp_folder_name] = {
+            "url": f"/photo/{mission_id}/{wp_folder_name}/{filename}",
+            "label": f"{wp_folder_name} · {filename}",
+        }
 
-    # Run YOLO inference if model is loaded (on every photo, but UI shows only latest per waypoint)
+    # Run YOLO inference if model is loaded (on every photo, but UI shows only latest per waypoint);
+    # the worker drops the photo from the page cache once it has read it
     if MODEL:
-        try:
-            results = MODEL(full_path)[0]
-            pred_filename = f"pred_{filename}"
-            pred_path = os.path.join(wp_folder_path, pred_filename)
-            results.save(filename=pred_path)
-            print(f"[YOLO_SAVE] {pred_path}")
-
-            # Save detected classes as JSON
-            detected = []
-            if results.boxes:
-                detected = list(set(results.names[int(cls)] for cls in results.boxes.cls))
-            dets_path = os.path.join(wp_folder_path, f"pred_dets_{image_index}.json")
-            with open(dets_path, "w") as f:
-                json.dump(detected, f)
-            print(f"[DETS_SAVE] {dets_path} - {detected}")
-        except Exception as e:
-            print(f"[YOLO_ERROR] {e}")
+        _enqueue_prediction((mission_id, wp_folder_name, wp_folder_path, filename, image_index))
+    else:
+        _drop_page_cache(full_path)
 
-    return jsonify({
-        "status": "ok",
+    return {
         "filename": filename,
         "waypoint_folder": wp_folder_name,
         "mission_id": mission_id,
-    })
+    }
+
+
+@app.route("/upload_photo", methods=["POST"])
+def upload_photo():
+    waypoint_index = request.form.get("waypoint_index", "unknown")
+    image_index = request.form.get("image_index", "0")
+    file = request.files.get("image")
+
+    if file is None:
+        return ojson({"status": "error", "message": "no image field"}, 400)
+
+    saved = _save_uploaded_photo(file, waypoint_index, image_index)
+    return ojson({"status": "ok", **saved})
+
+
+@app.route("/upload_photo_batch", methods=["POST"])
+def upload_photo_batch():
+    """All images of one waypoint in a single multipart request (repeated 'image' fields)."""
+    waypoint_index = request.form.get("waypoint_index", "unknown")
+    image_indexes = request.form.getlist("image_index")
+    files = request.files.getlist("image")
+
+    if not files:
+        return ojson({"status": "error", "message": "no image field"}, 400)
+
+    saved = []
+    for i, file in enumerate(files):
+        image_index = image_indexes[i] if i < len(image_indexes) else str(i)
+        saved.append(_save_uploaded_photo(file, waypoint_index, image_index))
+
+    return ojson({"status": "ok", "photos": saved})
 
 
 # ============================================================
 # MAIN
 # ============================================================
 
+# Development: python server_ai_model.py
+# Deployment: see wsgi.py (gunicorn via Procfile on Linux, waitress-serve on Windows).
+# Keep ONE worker process (control flags, latest photos and the inference thread
+# live in process memory); scale with threads.
+
 if __name__ == "__main__":
     print(f"[SERVER] BASE_SAVE_DIR = {BASE_SAVE_DIR}")
-    app.run(host="0.0.0.0", port=5000, debug=False)
\ No newline at end of file
+    app.run(host="0.0.0.0", port=5000, debug=False, threaded=True)
\ No newline at end of file
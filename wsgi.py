@@ -0,0 +1,7 @@
+#!/usr/bin/env python3
+# WSGI entry point for a production server:
+#   Linux:   gunicorn -w 1 -k gthread --threads 8 -b 0.0.0.0:5000 wsgi:application
+#   Windows: waitress-serve --threads=8 --port=5000 wsgi:application
+#            (gunicorn does not run on Windows; pip install waitress)
+# Use a single worker/process: robot control state and the YOLO worker are per-process.
+from server_ai_model import app as application